@@ -6,10 +6,12 @@
 from typing import List, Tuple, Dict
 import logging
 import os
+import struct
 import sys
 from pathlib import Path
 import numpy as np
 from collections import deque
+from google.protobuf import text_format
 from onnx import onnx_pb, AttributeProto, ModelProto, TensorProto, numpy_helper, helper, external_data_helper, save_model
 from shape_infer_helper import SymbolicShapeInferenceHelper
 
@@ -20,8 +22,23 @@ class OnnxModel:
     def __init__(self, model):
         self.model = model
         self._node_name_suffix: Dict[str, int] = {}  # key is node name prefix, value is the last suffix generated
+        self._node_name_suffix_seeded = False
         self.shape_infer_helper = None
         self.all_graphs = None
+        # Lazily built map from initializer name to TensorProto, reset by _invalidate_maps.
+        self._initializer_map = None
+        # Lazily built map from Constant node output name to the node, also reset by _invalidate_maps.
+        self._constant_output_map = None
+        # Lazily built map from graph input name to ValueInfoProto, also reset by _invalidate_maps.
+        self._graph_input_map = None
+        # Lazily built map from id(node) to its owning GraphProto, also reset by _invalidate_maps.
+        self._node_to_graph = None
+        # Decoded numpy arrays of constants queried by get_constant_value (None for misses).
+        self._const_value_cache: Dict[str, np.ndarray] = {}
+        # Python floats of single-element constants used by find_constant_input (None for misses).
+        self._const_scalar_cache: Dict[str, float] = {}
+        # Opset version of the default domain; the tools here never change it after load.
+        self._opset_version = None
 
     def infer_runtime_shape(self, dynamic_axis_mapping={}, update=False):
         if self.shape_infer_helper is None or update:
@@ -36,8 +53,11 @@ class OnnxModel:
         return None
 
     def input_name_to_nodes(self):
+        # Built fresh on every call: subclasses rename node inputs/outputs in place
+        # (e.g., node.input[i] = new_name), which no cache here could observe.
+        # Callers should fetch the map once per pass and reuse it locally.
         input_name_to_nodes = {}
-        for node in self.nodes():
+        for node in self._iter_nodes():
             for input_name in node.input:
                 if input_name not in input_name_to_nodes:
                     input_name_to_nodes[input_name] = [node]
@@ -46,18 +66,57 @@ class OnnxModel:
         return input_name_to_nodes
 
     def output_name_to_node(self):
+        # Built fresh on every call; see input_name_to_nodes.
         output_name_to_node = {}
-        for node in self.nodes():
+        for node in self._iter_nodes():
             for output_name in node.output:
                 output_name_to_node[output_name] = node
         return output_name_to_node
 
+    def _invalidate_maps(self):
+        """Drop cached lookup maps after a graph mutation that is not tracked incrementally."""
+        # A rebuilt node list copies graph-attribute-bearing nodes (If/Loop/Scan), which
+        # detaches the GraphProtos cached in all_graphs, so drop that list as well.
+        self.all_graphs = None
+        self._initializer_map = None
+        self._constant_output_map = None
+        self._graph_input_map = None
+        self._node_to_graph = None
+        self._const_value_cache = {}
+        self._const_scalar_cache = {}
+
+    def _register_node_in_maps(self, node, graph=None):
+        if node.op_type == 'Constant' and node.output:
+            self._const_value_cache.pop(node.output[0], None)
+            self._const_scalar_cache.pop(node.output[0], None)
+            if self._constant_output_map is not None:
+                self._constant_output_map[node.output[0]] = node
+        if graph is not None and self._node_to_graph is not None:
+            self._node_to_graph[id(node)] = (node, graph)
+
+    def _unregister_node_from_maps(self, node):
+        if node.op_type == 'Constant' and node.output:
+            self._const_value_cache.pop(node.output[0], None)
+            self._const_scalar_cache.pop(node.output[0], None)
+            if self._constant_output_map is not None and self._constant_output_map.get(node.output[0]) == node:
+                del self._constant_output_map[node.output[0]]
+        if self._node_to_graph is not None:
+            self._node_to_graph.pop(id(node), None)
+
     def nodes(self):
-        all_nodes = []
+        return list(self._iter_nodes())
+
+    def _iter_nodes(self):
+        """Iterate nodes of all graphs without materializing an intermediate list."""
+        if self._has_single_graph():
+            yield from self.model.graph.node
+            return
         for graph in self.graphs():
-            for node in graph.node:
-                all_nodes.append(node)
-        return all_nodes
+            yield from graph.node
+
+    def _has_single_graph(self):
+        """True when the model has no nested subgraph, enabling top-graph fast paths."""
+        return len(self.graphs()) == 1
 
     def graph(self):
         return self.model.graph
@@ -66,9 +125,9 @@ class OnnxModel:
         if self.all_graphs is not None:
             return self.all_graphs
         self.all_graphs = []
-        graph_queue = [self.model.graph]
+        graph_queue = deque([self.model.graph])
         while graph_queue:
-            graph = graph_queue.pop(0)
+            graph = graph_queue.popleft()
             self.all_graphs.append(graph)
             for node in graph.node:
                 for attr in node.attribute:
@@ -82,6 +141,8 @@ class OnnxModel:
         return self.all_graphs
 
     def get_graphs_input_names(self):
+        if self._has_single_graph():
+            return [input.name for input in self.model.graph.input]
         input_names = []
         for graph in self.graphs():
             for input in graph.input:
@@ -89,6 +150,8 @@ class OnnxModel:
         return input_names
 
     def get_graphs_output_names(self):
+        if self._has_single_graph():
+            return [output.name for output in self.model.graph.output]
         output_names = []
         for graph in self.graphs():
             for output in graph.output:
@@ -96,59 +159,136 @@ class OnnxModel:
         return output_names
 
     def get_graph_by_node(self, node):
+        if self._node_to_graph is None:
+            node_to_graph = {}
+            for graph in self.graphs():
+                for graph_node in graph.node:
+                    # Keep the node in the value so its wrapper (and thus its id) stays alive.
+                    node_to_graph[id(graph_node)] = (graph_node, graph)
+            self._node_to_graph = node_to_graph
+
+        entry = self._node_to_graph.get(id(node))
+        if entry is not None:
+            return entry[1]
+
+        # The caller may hold an equal copy rather than the stored message.
         for graph in self.graphs():
             if node in graph.node:
                 return graph
         return None
 
     def get_graph_by_name(self, graph_name):
+        if self._has_single_graph():
+            return self.model.graph if graph_name == self.model.graph.name else None
         for graph in self.graphs():
             if graph_name == graph.name:
                 return graph
         return None
 
     def get_topological_insert_id(self, graph, outputs):
+        output_set = set(outputs)
         for idx, node in enumerate(graph.node):
             for input in node.input:
-                if input in outputs:
+                if input in output_set:
                     return idx
         return len(graph.node)
 
     def remove_node(self, node):
-        for graph in self.graphs():
-            if node in graph.node:
-                graph.node.remove(node)
+        graph = self.get_graph_by_node(node)
+        if graph is not None:
+            graph.node.remove(node)
+            self._unregister_node_from_maps(node)
 
     def remove_nodes(self, nodes_to_remove):
-        for node in nodes_to_remove:
-            self.remove_node(node)
+        if not nodes_to_remove:
+            return
+
+        # Rebuild each graph's node list in one pass instead of calling remove() per node,
+        # which linearly scans the repeated field for every deletion.
+        ids_to_remove = {id(node) for node in nodes_to_remove}
+        removed_count = 0
+        rebuilt = False
+        for graph in self.graphs():
+            kept_nodes = [node for node in graph.node if id(node) not in ids_to_remove]
+            if len(kept_nodes) < len(graph.node):
+                removed_count += len(graph.node) - len(kept_nodes)
+                self._retain(graph.node, kept_nodes)
+                rebuilt = True
+
+        if rebuilt:
+            # Rebuilding the repeated field replaces the kept messages by copies, so the
+            # cached maps (including all_graphs) cannot be patched incrementally.
+            self._invalidate_maps()
+
+        if removed_count < len(ids_to_remove):
+            # Fall back to equality-based removal for nodes that were copied rather than
+            # taken from the graph directly.
+            for node in nodes_to_remove:
+                self.remove_node(node)
 
     def add_node(self, node, graph_name=None):
+        # Note that protobuf containers store a copy, so register the stored message in the maps.
         if graph_name is None or graph_name == self.model.graph.name:
             self.model.graph.node.extend([node])
+            self._register_node_in_maps(self.model.graph.node[-1], self.model.graph)
         else:
             graph = self.get_graph_by_name(graph_name)
             insert_idx = self.get_topological_insert_id(graph, node.output)
             graph.node.insert(insert_idx, node)
+            self._register_node_in_maps(graph.node[insert_idx], graph)
 
     def add_nodes(self, nodes_to_add, node_name_to_graph_name=None):
+        if not nodes_to_add:
+            return
+
         if node_name_to_graph_name is None:
             self.model.graph.node.extend(nodes_to_add)
-        else:
-            for node in nodes_to_add:
-                graph_name = node_name_to_graph_name[node.name]
-                self.add_node(node, graph_name)
+            for node in self.model.graph.node[-len(nodes_to_add):]:
+                self._register_node_in_maps(node, self.model.graph)
+            return
+
+        # Resolve each target graph once and insert nodes per graph in one batch instead of
+        # scanning all graphs (and the insertion point) per node.
+        name_to_graph = {}
+        for graph in self.graphs():
+            if graph.name not in name_to_graph:
+                name_to_graph[graph.name] = graph
+
+        nodes_by_graph_name = {}
+        for node in nodes_to_add:
+            nodes_by_graph_name.setdefault(node_name_to_graph_name[node.name], []).append(node)
+
+        for graph_name, group in nodes_by_graph_name.items():
+            graph = name_to_graph[graph_name]
+            if graph is self.model.graph:
+                graph.node.extend(group)
+                for node in graph.node[-len(group):]:
+                    self._register_node_in_maps(node, graph)
+            else:
+                # The insert position depends on each node's own outputs: one shared
+                # position for the group can place a node before its producer, and
+                # topological_sort does not re-sort subgraphs afterwards.
+                for node in group:
+                    insert_idx = self.get_topological_insert_id(graph, node.output)
+                    graph.node.insert(insert_idx, node)
+                    self._register_node_in_maps(graph.node[insert_idx], graph)
 
     def add_initializer(self, tensor, graph_name=None):
         if graph_name is None or graph_name == self.model.graph.name:
-            self.model.graph.initializer.extend([tensor])
+            graph = self.model.graph
         else:
             graph = self.get_graph_by_name(graph_name)
-            graph.initializer.extend([tensor])
+        graph.initializer.extend([tensor])
+        if self._initializer_map is not None and tensor.name not in self._initializer_map:
+            self._initializer_map[tensor.name] = graph.initializer[-1]
+        self._const_value_cache.pop(tensor.name, None)
+        self._const_scalar_cache.pop(tensor.name, None)
 
     def add_input(self, input, graph_name=None):
         if graph_name is None or graph_name == self.model.graph.name:
             self.model.graph.input.extend([input])
+            if self._graph_input_map is not None and input.name not in self._graph_input_map:
+                self._graph_input_map[input.name] = self.model.graph.input[-1]
         else:
             graph = self.get_graph_by_name(graph_name)
             graph.input.extend([input])
@@ -156,12 +296,12 @@ class OnnxModel:
     @staticmethod
     def replace_node_input(node, old_input_name, new_input_name):
         assert isinstance(old_input_name, str) and isinstance(new_input_name, str)
-        for j in range(len(node.input)):
-            if node.input[j] == old_input_name:
-                node.input[j] = new_input_name
+        if old_input_name in node.input:
+            node.input[:] = [new_input_name if x == old_input_name else x for x in node.input]
 
     # This function is deprecated since we use onnxconverter-common
     def replace_input_of_all_nodes(self, old_input_name, new_input_name):
+        # Scoped to the top-level graph, like replace_output_of_all_nodes.
         for node in self.model.graph.node:
             OnnxModel.replace_node_input(node, old_input_name, new_input_name)
 
@@ -176,20 +316,20 @@ class OnnxModel:
     def replace_output_of_all_nodes(self, old_output_name, new_output_name):
         for node in self.model.graph.node:
             OnnxModel.replace_node_output(node, old_output_name, new_output_name)
+        self._invalidate_maps()
 
     def get_initializer(self, name):
-        for graph in self.graphs():
-            for tensor in graph.initializer:
-                if tensor.name == name:
-                    return tensor
-        return None
+        if self._initializer_map is None:
+            initializer_map = {}
+            for graph in self.graphs():
+                for tensor in graph.initializer:
+                    if tensor.name not in initializer_map:
+                        initializer_map[tensor.name] = tensor
+            self._initializer_map = initializer_map
+        return self._initializer_map.get(name)
 
     def get_nodes_by_op_type(self, op_type):
-        nodes = []
-        for node in self.nodes():
-            if node.op_type == op_type:
-                nodes.append(node)
-        return nodes
+        return [node for node in self._iter_nodes() if node.op_type == op_type]
 
     def get_children(self, node, input_name_to_nodes=None):
         if (input_name_to_nodes is None):
@@ -239,12 +379,13 @@ class OnnxModel:
             parent: The matched parent node. None if not found.
             index: The input index of matched parent node. None if not found.
         '''
+        exclude_ids = frozenset(id(n) for n in exclude)
         for i, input in enumerate(node.input):
             if input in output_name_to_node:
                 parent = output_name_to_node[input]
-                if parent.op_type == parent_op_type and parent not in exclude:
+                if parent.op_type == parent_op_type and id(parent) not in exclude_ids:
                     return parent, i
-                else:
+                elif logger.isEnabledFor(logging.DEBUG):
                     logger.debug(f"To find first {parent_op_type}, current {parent.op_type}")
         return None, None
 
@@ -283,19 +424,24 @@ class OnnxModel:
             return parent
 
         if input_index >= len(node.input):
-            logger.debug(f"input_index {input_index} >= node inputs {len(node.input)}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"input_index {input_index} >= node inputs {len(node.input)}")
             return None
 
         parent = self.get_parent(node, input_index, output_name_to_node)
-        if parent is not None and parent.op_type == parent_op_type and parent not in exclude:
-            return parent
+        if parent is not None and parent.op_type == parent_op_type:
+            if not exclude or id(parent) not in frozenset(id(n) for n in exclude):
+                return parent
 
-        if parent is not None:
+        if parent is not None and logger.isEnabledFor(logging.DEBUG):
             logger.debug(f"Expect {parent_op_type}, Got {parent.op_type}")
 
         return None
 
     def match_parent_paths(self, node, paths, output_name_to_node):
+        if output_name_to_node is None:
+            output_name_to_node = self.output_name_to_node()
+
         for i, path in enumerate(paths):
             assert isinstance(path, List) or isinstance(path, Tuple)
             return_indice = []
@@ -339,8 +485,10 @@ class OnnxModel:
                                                exclude=[],
                                                return_indice=return_indice)
             if matched_parent is None:
-                logger.debug(f"Failed to match index={i} parent_input_index={parent_input_index[i]} op_type={op_type}",
-                             stack_info=True)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        f"Failed to match index={i} parent_input_index={parent_input_index[i]} op_type={op_type}",
+                        stack_info=True)
                 return None
 
             matched_parents.append(matched_parent)
@@ -349,17 +497,26 @@ class OnnxModel:
         return matched_parents
 
     def find_first_child_by_type(self, node, child_type, input_name_to_nodes=None, recursive=True):
-        children = self.get_children(node, input_name_to_nodes)
-        dq = deque(children)
+        if input_name_to_nodes is None:
+            input_name_to_nodes = self.input_name_to_nodes()
+
+        visited = set()
+        dq = deque()
+        for child in self.get_children(node, input_name_to_nodes):
+            if id(child) not in visited:
+                visited.add(id(child))
+                dq.append(child)
+
         while len(dq) > 0:
-            current_node = dq.pop()
+            current_node = dq.popleft()
             if current_node.op_type == child_type:
                 return current_node
 
             if recursive:
-                children = self.get_children(current_node, input_name_to_nodes)
-                for child in children:
-                    dq.appendleft(child)
+                for child in self.get_children(current_node, input_name_to_nodes):
+                    if id(child) not in visited:
+                        visited.add(id(child))
+                        dq.append(child)
 
         return None
 
@@ -367,34 +524,51 @@ class OnnxModel:
         if output_name_to_node is None:
             output_name_to_node = self.output_name_to_node()
 
-        parents = self.get_parents(node, output_name_to_node)
-        dq = deque(parents)
+        visited = set()
+        dq = deque()
+        for parent in self.get_parents(node, output_name_to_node):
+            if id(parent) not in visited:
+                visited.add(id(parent))
+                dq.append(parent)
+
         while len(dq) > 0:
-            current_node = dq.pop()
+            current_node = dq.popleft()
             if current_node.op_type == parent_type:
                 return current_node
 
             if recursive:
-                parents = self.get_parents(current_node, output_name_to_node)
-                for parent in parents:
-                    dq.appendleft(parent)
+                for parent in self.get_parents(current_node, output_name_to_node):
+                    if id(parent) not in visited:
+                        visited.add(id(parent))
+                        dq.append(parent)
 
         return None
 
-    def get_constant_value(self, output_name):
-        for node in self.get_nodes_by_op_type('Constant'):
-            if node.output[0] == output_name:
-                for att in node.attribute:
-                    if att.name == 'value':
-                        return numpy_helper.to_array(att.t)
+    def _get_constant_tensor(self, output_name):
+        """Return the TensorProto behind a Constant node output or initializer, without decoding it."""
+        if self._constant_output_map is None:
+            self._constant_output_map = {node.output[0]: node for node in self.get_nodes_by_op_type('Constant')}
+
+        node = self._constant_output_map.get(output_name)
+        if node is not None:
+            for att in node.attribute:
+                if att.name == 'value':
+                    return att.t
 
         # Fall back to intializer since constant folding might have been
         # applied.
-        initializer = self.get_initializer(output_name)
-        if initializer is not None:
-            return numpy_helper.to_array(initializer)
+        return self.get_initializer(output_name)
 
-        return None
+    def get_constant_value(self, output_name):
+        if output_name in self._const_value_cache:
+            return self._const_value_cache[output_name]
+
+        tensor = self._get_constant_tensor(output_name)
+        value = numpy_helper.to_array(tensor) if tensor is not None else None
+
+        # Cache misses as well so that repeated queries of non-constant inputs stay cheap.
+        self._const_value_cache[output_name] = value
+        return value
 
     def get_constant_input(self, node):
         for i, input in enumerate(node.input):
@@ -404,21 +578,62 @@ class OnnxModel:
 
         return None, None
 
+    # struct formats to decode a single-element tensor from raw bytes without numpy.
+    _scalar_struct_formats = {
+        TensorProto.FLOAT: '<f',
+        TensorProto.DOUBLE: '<d',
+        TensorProto.FLOAT16: '<e',
+    }
+
+    def _get_constant_scalar(self, output_name):
+        """Return the python float of a single-element constant, or None if there is no such constant."""
+        if output_name in self._const_scalar_cache:
+            return self._const_scalar_cache[output_name]
+
+        scalar = None
+        tensor = self._get_constant_tensor(output_name)
+        if tensor is not None:
+            format = OnnxModel._scalar_struct_formats.get(tensor.data_type)
+            if format is not None and tensor.raw_data and len(tensor.raw_data) == struct.calcsize(format):
+                # Decode the few raw bytes directly instead of materializing an ndarray.
+                scalar = struct.unpack(format, tensor.raw_data)[0]
+            else:
+                value = self.get_constant_value(output_name)
+                if value is not None and value.size == 1:
+                    scalar = float(value.item(0))
+
+        self._const_scalar_cache[output_name] = scalar
+        return scalar
+
     def find_constant_input(self, node, expected_value, delta=0.000001):
-        i, value = self.get_constant_input(node)
-        if value is not None and value.size == 1 and abs(value - expected_value) < delta:
-            return i
+        for i, input in enumerate(node.input):
+            if self._get_constant_tensor(input) is None:
+                continue
+            # Match the first constant input only, like get_constant_input does.
+            scalar = self._get_constant_scalar(input)
+            if scalar is not None and abs(scalar - expected_value) < delta:
+                return i
+            return -1
 
         return -1
 
+    def get_constant_rank(self, output_name):
+        """Return the rank of a constant tensor from its dims field without decoding the data.
+           None is returned when the name is not a constant.
+        """
+        tensor = self._get_constant_tensor(output_name)
+        if tensor is None:
+            return None
+        return len(tensor.dims)
+
     def is_constant_with_specified_dimension(self, output_name, dimensions, description):
-        value = self.get_constant_value(output_name)
-        if value is None:
+        rank = self.get_constant_rank(output_name)
+        if rank is None:
             logger.debug(f"{description} {output_name} is not initializer.")
             return False
 
-        if len(value.shape) != dimensions:
-            logger.debug(f"{description} {output_name} shall have {dimensions} dimensions. Got shape {value.shape}")
+        if rank != dimensions:
+            logger.debug(f"{description} {output_name} shall have {dimensions} dimensions. Got {rank}")
             return False
 
         return True
@@ -433,21 +648,23 @@ class OnnxModel:
         children = input_name_to_nodes[root_node.output[0]]
 
         unique_nodes = []
+        visited = set()
 
         dq = deque(children)
         while len(dq) > 0:
-            current_node = dq.pop()
+            current_node = dq.popleft()
             if current_node in stop_nodes:
                 continue
 
-            if current_node not in unique_nodes:
+            if id(current_node) not in visited:
+                visited.add(id(current_node))
                 unique_nodes.append(current_node)
 
                 for output in current_node.output:
                     if output in input_name_to_nodes:
-                        children = input_name_to_nodes[output]
-                        for child in children:
-                            dq.appendleft(child)
+                        for child in input_name_to_nodes[output]:
+                            if id(child) not in visited:
+                                dq.append(child)
 
         return unique_nodes
 
@@ -500,6 +717,9 @@ class OnnxModel:
         # restore opset version
         self.model.opset_import[0].version = original_opset_version
 
+        self.all_graphs = None
+        self._invalidate_maps()
+
     def convert_model_float32_to_float16(self, cast_input_output=True, use_symbolic_shape_infer=True):
         """Convert a graph to FLOAT16. By default, we will keep data types of inputs and outputs.
            For decoder model with past_key_values, it is recommended to set cast_input_output=False for better performance.
@@ -518,28 +738,42 @@ class OnnxModel:
             self.model = oc.float16.convert_float_to_float16(model,
                                                              keep_io_types=cast_input_output,
                                                              disable_shape_infer=use_symbolic_shape_infer)
+            self.all_graphs = None
+            self._invalidate_maps()
             return
 
+        def tensor_float32_to_float16(tensor):
+            if tensor.raw_data:
+                # Cast the raw bytes directly to skip to_array's shape reconstruction
+                # and from_array's tensor rebuild.
+                fp16_data = np.frombuffer(tensor.raw_data, dtype=np.float32).astype(np.float16)
+                tensor.raw_data = fp16_data.tobytes()
+            else:
+                fp16_data = np.asarray(tensor.float_data, dtype=np.float32).astype(np.float16)
+                del tensor.float_data[:]
+                tensor.int32_data.extend(fp16_data.view(np.uint16).tolist())
+            tensor.data_type = TensorProto.FLOAT16
+
         graph = self.model.graph
         initializers = graph.initializer
 
         for initializer in initializers:
-            if initializer.data_type == 1:
-                initializer.CopyFrom(
-                    numpy_helper.from_array(numpy_helper.to_array(initializer).astype(np.float16), initializer.name))
+            if initializer.data_type == TensorProto.FLOAT:
+                tensor_float32_to_float16(initializer)
 
         for node in graph.node:
             if node.op_type in ['Constant', 'ConstantOfShape']:
                 for att in node.attribute:
-                    if att.name == 'value' and att.t.data_type == 1:
-                        att.CopyFrom(
-                            helper.make_attribute(
-                                "value", numpy_helper.from_array(numpy_helper.to_array(att.t).astype(np.float16))))
+                    if att.name == 'value' and att.t.data_type == TensorProto.FLOAT:
+                        tensor_float32_to_float16(att.t)
             if node.op_type == 'Cast':
                 for att in node.attribute:
                     if att.name == 'to' and att.i == 1:
                         att.CopyFrom(helper.make_attribute("to", int(TensorProto.FLOAT16)))
 
+        # Initializers and Constant values changed in place, so cached decoded values are stale.
+        self._invalidate_maps()
+
         if not cast_input_output:
             self.change_input_output_float32_to_float16()
             return
@@ -581,6 +815,9 @@ class OnnxModel:
             str: node name
         """
 
+        if not self._node_name_suffix_seeded:
+            self._seed_node_name_suffix()
+
         if name_prefix:
             prefix = name_prefix if name_prefix.endswith("_") else (name_prefix + "_")
         else:
@@ -589,26 +826,40 @@ class OnnxModel:
         suffix: int = 0
         if prefix in self._node_name_suffix:
             suffix = self._node_name_suffix[prefix] + 1
-        else:
-            # Check existed node name only once for a prefix as we assume create_node_name is called for every new node in fusion.
-            for node in self.nodes():
-                if node.name and node.name.startswith(prefix):
-                    try:
-                        index = int(node.name[len(prefix):])
-                        suffix = max(index + 1, suffix)
-                    except ValueError:
-                        continue
 
         # Record the generated suffix so that we can avoid generating duplicated name.
         self._node_name_suffix[prefix] = suffix
 
         return prefix + str(suffix)
 
+    def _seed_node_name_suffix(self):
+        """Record the largest integer suffix of existing node names for each name prefix.
+
+        A single pass over all nodes replaces the full-graph scan that create_node_name
+        used to run on the first use of every prefix.
+        """
+        for node in self._iter_nodes():
+            name = node.name
+            pos = name.rfind("_")
+            if pos <= 0:
+                continue
+            try:
+                index = int(name[pos + 1:])
+            except ValueError:
+                continue
+            prefix = name[:pos + 1]
+            if index > self._node_name_suffix.get(prefix, index - 1):
+                self._node_name_suffix[prefix] = index
+        self._node_name_suffix_seeded = True
+
     def find_graph_input(self, input_name):
-        for input in self.model.graph.input:
-            if input.name == input_name:
-                return input
-        return None
+        if self._graph_input_map is None:
+            graph_input_map = {}
+            for input in self.model.graph.input:
+                if input.name not in graph_input_map:
+                    graph_input_map[input.name] = input
+            self._graph_input_map = graph_input_map
+        return self._graph_input_map.get(input_name)
 
     def find_graph_output(self, output_name):
         for output in self.model.graph.output:
@@ -621,20 +872,24 @@ class OnnxModel:
             output_name_to_node = self.output_name_to_node()
 
         unique_nodes = []
+        visited = set()
 
         parents = self.get_parents(node, output_name_to_node)
         dq = deque(parents)
         while len(dq) > 0:
-            current_node = dq.pop()
+            current_node = dq.popleft()
             if current_node in stop_nodes:
                 continue
 
-            if current_node not in unique_nodes:
+            if id(current_node) not in visited:
+                visited.add(id(current_node))
                 unique_nodes.append(current_node)
 
                 for input in current_node.input:
                     if input in output_name_to_node:
-                        dq.appendleft(output_name_to_node[input])
+                        parent = output_name_to_node[input]
+                        if id(parent) not in visited:
+                            dq.append(parent)
 
         return unique_nodes
 
@@ -643,15 +898,18 @@ class OnnxModel:
         Find graph inputs that linked to current node.
         """
         graph_inputs = []
+        seen = set()
         for input in current_node.input:
-            if self.find_graph_input(input) and input not in graph_inputs:
+            if self.find_graph_input(input) and input not in seen:
+                seen.add(input)
                 graph_inputs.append(input)
 
         if recursive:
             parent_nodes = self.get_parent_subgraph_nodes(current_node, [])
             for node in parent_nodes:
                 for input in node.input:
-                    if self.find_graph_input(input) and input not in graph_inputs:
+                    if self.find_graph_input(input) and input not in seen:
+                        seen.add(input)
                         graph_inputs.append(input)
         return graph_inputs
 
@@ -664,15 +922,28 @@ class OnnxModel:
             index += 1
         return -1
 
+    @staticmethod
+    def _retain(repeated_field, messages_to_keep):
+        """Replace the contents of a repeated field with the given messages.
+
+        One clear-and-extend rebuild instead of per-element remove(), which is
+        quadratic over protobuf repeated message fields. Note that extend stores
+        copies, so references into the old field contents become stale; callers
+        retaining a node field must follow up with _invalidate_maps, which also
+        drops all_graphs since kept If/Loop/Scan nodes are copied with their
+        subgraphs.
+        """
+        del repeated_field[:]
+        repeated_field.extend(messages_to_keep)
+
     def remove_unused_constant(self):
         input_name_to_nodes = self.input_name_to_nodes()
 
         #remove unused constant
-        unused_nodes = []
-        nodes = self.nodes()
-        for node in nodes:
-            if node.op_type == "Constant" and node.output[0] not in input_name_to_nodes:
-                unused_nodes.append(node)
+        unused_nodes = [
+            node for node in self._iter_nodes()
+            if node.op_type == "Constant" and node.output[0] not in input_name_to_nodes
+        ]
 
         self.remove_nodes(unused_nodes)
 
@@ -698,40 +969,62 @@ class OnnxModel:
         if outputs is None:
             outputs = [output.name for output in self.model.graph.output]
 
-        output_name_to_node = self.output_name_to_node()
-        all_nodes = []
+        # Mark all ancestors of the required outputs with one reverse BFS that shares a
+        # visited set, instead of walking the parent subgraph once per output.
+        # Build the producer map locally in one pass; pruning operates on the top-level
+        # graph only (see the early return above), so graph.node covers every producer.
+        output_name_to_node = {}
+        for node in self.model.graph.node:
+            for output_name in node.output:
+                output_name_to_node[output_name] = node
+        keep = set()
+        dq = deque()
         for output in outputs:
             if output in output_name_to_node:
                 last_node = output_name_to_node[output]
-                if last_node in all_nodes:
-                    continue
-                nodes = self.get_parent_subgraph_nodes(last_node, [])
-                all_nodes.append(last_node)
-                all_nodes.extend(nodes)
+                if id(last_node) not in keep:
+                    keep.add(id(last_node))
+                    dq.append(last_node)
+
+        while dq:
+            node = dq.popleft()
+            for input in node.input:
+                if input in output_name_to_node:
+                    parent = output_name_to_node[input]
+                    if id(parent) not in keep:
+                        keep.add(id(parent))
+                        dq.append(parent)
 
         nodes_to_remove = []
         for node in self.model.graph.node:
-            if node not in all_nodes:
+            if id(node) not in keep:
                 nodes_to_remove.append(node)
 
         self.remove_nodes(nodes_to_remove)
 
         # remove outputs not in list
         output_to_remove = []
+        output_to_keep = []
         for output in self.model.graph.output:
             if output.name not in outputs:
                 output_to_remove.append(output)
-        for output in output_to_remove:
-            self.model.graph.output.remove(output)
+            else:
+                output_to_keep.append(output)
+        if output_to_remove:
+            self._retain(self.model.graph.output, output_to_keep)
 
         # remove inputs not used by any node.
         input_name_to_nodes = self.input_name_to_nodes()
         input_to_remove = []
+        input_to_keep = []
         for input in self.model.graph.input:
             if input.name not in input_name_to_nodes:
                 input_to_remove.append(input)
-        for input in input_to_remove:
-            self.model.graph.input.remove(input)
+            else:
+                input_to_keep.append(input)
+        if input_to_remove:
+            self._retain(self.model.graph.input, input_to_keep)
+            self._graph_input_map = None
 
         logger.info("Graph pruned: {} inputs, {} outputs and {} nodes are removed".format(
             len(input_to_remove), len(output_to_remove), len(nodes_to_remove)))
@@ -741,120 +1034,147 @@ class OnnxModel:
     def update_graph(self, verbose=False):
         graph = self.model.graph
 
-        remaining_input_names = []
+        # Collect the used input names with a direct scan of the nodes so the result can
+        # never lag behind an in-place edge rename; this is a single O(N) pass anyway.
+        remaining_input_names = set()
         for node in graph.node:
             if node.op_type in ['Loop', 'Scan', 'If']:
                 # TODO: handle inner graph
                 logger.debug(f"Skip update_graph since graph has operator: {node.op_type}")
                 return
             if node.op_type != "Constant":
-                for input_name in node.input:
-                    if input_name not in remaining_input_names:
-                        remaining_input_names.append(input_name)
+                remaining_input_names.update(input_name for input_name in node.input if input_name)
         if verbose:
             logger.debug(f"remaining input names: {remaining_input_names}")
 
         # remove graph input that is not used
-        inputs_to_remove = []
+        inputs_to_keep = []
+        input_names_to_remove = []
         for input in graph.input:
-            if input.name not in remaining_input_names:
-                inputs_to_remove.append(input)
-        for input in inputs_to_remove:
-            graph.input.remove(input)
+            if input.name in remaining_input_names:
+                inputs_to_keep.append(input)
+            else:
+                input_names_to_remove.append(input.name)
+        if input_names_to_remove:
+            self._retain(graph.input, inputs_to_keep)
+            self._graph_input_map = None
 
-        names_to_remove = [input.name for input in inputs_to_remove]
-        logger.debug(f"remove {len(inputs_to_remove)} unused inputs: {names_to_remove}")
+        logger.debug(f"remove {len(input_names_to_remove)} unused inputs: {input_names_to_remove}")
 
         # remove weights that are not used
-        weights_to_remove = []
+        graph_output_names = {output.name for output in graph.output}
         weights_to_keep = []
+        weight_names_to_keep = []
+        weight_names_to_remove = []
         for initializer in graph.initializer:
-            if initializer.name not in remaining_input_names and not self.find_graph_output(initializer.name):
-                weights_to_remove.append(initializer)
+            if initializer.name not in remaining_input_names and initializer.name not in graph_output_names:
+                weight_names_to_remove.append(initializer.name)
             else:
-                weights_to_keep.append(initializer.name)
-        for initializer in weights_to_remove:
-            graph.initializer.remove(initializer)
+                weights_to_keep.append(initializer)
+                weight_names_to_keep.append(initializer.name)
+        if weight_names_to_remove:
+            self._retain(graph.initializer, weights_to_keep)
+            self._initializer_map = None
 
-        names_to_remove = [initializer.name for initializer in weights_to_remove]
-        logger.debug(f"remove {len(weights_to_remove)} unused initializers: {names_to_remove}")
+        logger.debug(f"remove {len(weight_names_to_remove)} unused initializers: {weight_names_to_remove}")
         if verbose:
-            logger.debug(f"remaining initializers:{weights_to_keep}")
+            logger.debug(f"remaining initializers:{weight_names_to_keep}")
 
         self.remove_unused_constant()
 
     def is_safe_to_fuse_nodes(self, nodes_to_remove, keep_outputs, input_name_to_nodes, output_name_to_node):
+        remove_set = {id(node) for node in nodes_to_remove}
+        keep_output_set = set(keep_outputs)
         for node_to_remove in nodes_to_remove:
             for output_to_remove in node_to_remove.output:
-                if output_to_remove in keep_outputs:
+                if output_to_remove in keep_output_set:
                     continue
 
                 if output_to_remove in input_name_to_nodes:
                     for impacted_node in input_name_to_nodes[output_to_remove]:
-                        if impacted_node not in nodes_to_remove:
-                            logger.debug(
-                                f"it is not safe to remove nodes since output {output_to_remove} is used by {impacted_node}"
-                            )
+                        if id(impacted_node) not in remove_set:
+                            if logger.isEnabledFor(logging.DEBUG):
+                                logger.debug(
+                                    f"it is not safe to remove nodes since output {output_to_remove} is used by {impacted_node}"
+                                )
                             return False
         return True
 
     @staticmethod
     def graph_topological_sort(graph):
-        deps_count = [0] * len(graph.node)  # dependency count of each node
-        deps_to_nodes = {}  # input to node indice
-        sorted_nodes = []  # initialize sorted_nodes
-        for node_idx, node in enumerate(graph.node):
-            # CANNOT use len(node.input) directly because input can be optional
-            deps_count[node_idx] = sum(1 for _ in node.input if _)
-            if deps_count[node_idx] == 0:  # Constant doesn't depend on any inputs
-                sorted_nodes.append(graph.node[node_idx])
-                continue
+        # Kahn's algorithm over a reverse adjacency map. Only inputs produced by another
+        # node count as dependencies: names coming from initializers, graph inputs or the
+        # outer scope are available from the start, so there is no need to collect and
+        # deduplicate those names.
+        # Note: this logic only applies to top level graph since a sub graph could use intializer from parent graph
+        # Snapshot the nodes once so the traversal works on python references instead of
+        # going through the protobuf indexer for every visit.
+        nodes = list(graph.node)
+
+        producers = {}  # output name to producing node index
+        for node_idx, node in enumerate(nodes):
+            for output_name in node.output:
+                if output_name:
+                    producers[output_name] = node_idx
 
+        consumers = {}  # tensor name to indices of nodes consuming it
+        deps_count = [0] * len(nodes)  # count of node-produced inputs of each node
+        for node_idx, node in enumerate(nodes):
             for input_name in node.input:
-                if input_name not in deps_to_nodes:
-                    deps_to_nodes[input_name] = [node_idx]
-                else:
-                    deps_to_nodes[input_name].append(node_idx)
+                if input_name and input_name in producers:
+                    deps_count[node_idx] += 1
+                    consumers.setdefault(input_name, []).append(node_idx)
+
+        dq = deque(node_idx for node_idx, count in enumerate(deps_count) if count == 0)
+        sorted_indices = []
+        # Bind the hot attribute lookups to locals; the loop body runs once per edge.
+        popleft = dq.popleft
+        append = dq.append
+        record_sorted = sorted_indices.append
+        get_consumers = consumers.get
+        while dq:
+            node_idx = popleft()
+            record_sorted(node_idx)
+            for output_name in nodes[node_idx].output:
+                for consumer_idx in get_consumers(output_name, ()):
+                    deps_count[consumer_idx] -= 1
+                    if deps_count[consumer_idx] == 0:
+                        append(consumer_idx)
+
+        assert (len(sorted_indices) == len(nodes)), "Graph is not a DAG"
+        graph.ClearField('node')
+        graph.node.extend(nodes[node_idx] for node_idx in sorted_indices)
 
-        # Note: this logic only applies to top level graph since a sub graph could use intializer from parent graph
-        initializer_names = [init.name for init in graph.initializer]
-        graph_input_names = [input.name for input in graph.input]
-        input_names = initializer_names + graph_input_names
-        input_names.sort()
-        prev_input_name = None
-        for input_name in input_names:
-            if prev_input_name == input_name:
-                continue
+    @staticmethod
+    def is_topologically_sorted(graph):
+        """Check whether graph nodes are already in topological order with one pass."""
+        node_outputs = set()
+        for node in graph.node:
+            node_outputs.update(node.output)
 
-            prev_input_name = input_name
-            if input_name in deps_to_nodes:
-                for node_idx in deps_to_nodes[input_name]:
-                    deps_count[node_idx] = deps_count[node_idx] - 1
-                    if deps_count[node_idx] == 0:
-                        sorted_nodes.append(graph.node[node_idx])
-
-        start = 0
-        end = len(sorted_nodes)
-
-        while start < end:
-            for output in sorted_nodes[start].output:
-                if output in deps_to_nodes:
-                    for node_idx in deps_to_nodes[output]:
-                        deps_count[node_idx] = deps_count[node_idx] - 1
-                        if deps_count[node_idx] == 0:
-                            sorted_nodes.append(graph.node[node_idx])
-                            end = end + 1
-            start = start + 1
-
-        assert (end == len(graph.node)), "Graph is not a DAG"
-        graph.ClearField('node')
-        graph.node.extend(sorted_nodes)
+        # Names not produced by any node (initializers, graph inputs, outer scope values)
+        # are available from the start.
+        produced = set()
+        for node in graph.node:
+            for input_name in node.input:
+                if input_name and input_name in node_outputs and input_name not in produced:
+                    return False
+            produced.update(node.output)
+        return True
 
     def topological_sort(self):
         #TODO: support graph_topological_sort() in subgraphs
         #for graph in self.graphs():
         #    self.graph_topological_sort(graph)
+
+        # Models from standard exporters are usually sorted already; checking costs one
+        # pass and skips the node-list rebuild (which also detaches cached messages).
+        if OnnxModel.is_topologically_sorted(self.model.graph):
+            return
+
         OnnxModel.graph_topological_sort(self.model.graph)
+        # The node list was rebuilt, so cached maps refer to detached messages.
+        self._invalidate_maps()
 
     def save_model_to_file(self, output_path, use_external_data_format=False):
         logger.info(f"Sort graphs in topological order")
@@ -867,27 +1187,33 @@ class OnnxModel:
         if output_path.endswith(".json"):  # Output text for testing small model.
             assert isinstance(self.model, ModelProto)
             with open(output_path, "w") as out:
-                out.write(str(self.model))
+                # PrintMessage streams directly to the file instead of building the
+                # whole text rendering in memory first like str(self.model).
+                text_format.PrintMessage(self.model, out)
         else:
             # Save model to external data, which is needed for model size > 2GB
             if use_external_data_format:
-                data_file = str(Path(output_path).name + ".data")
-                if os.path.isfile(data_file):
-                    os.remove(data_file)
+                # The location is stored in the model as a name relative to the model file,
+                # but the stale-file check and the write need the real path next to it.
+                output_dir = Path(output_path).parent
+                data_file = Path(output_path).name + ".data"
+                data_path = output_dir / data_file
+                if data_path.is_file():
+                    data_path.unlink()
                 external_data_helper.convert_model_to_external_data(self.model,
                                                                     all_tensors_to_one_file=True,
                                                                     location=data_file)
+                # Write the tensor bytes out now so save_model serializes the slimmed-down
+                # proto instead of carrying the raw data through another copy.
+                external_data_helper.write_external_data_tensors(self.model, str(output_dir))
             save_model(self.model, output_path)
 
     def get_graph_inputs_excluding_initializers(self):
         """
         Returns real graph inputs (excluding initializers from older onnx model).
         """
-        graph_inputs = []
-        for input in self.model.graph.input:
-            if self.get_initializer(input.name) is None:
-                graph_inputs.append(input)
-        return graph_inputs
+        initializer_names = {initializer.name for initializer in self.model.graph.initializer}
+        return [input for input in self.model.graph.input if input.name not in initializer_names]
 
     def get_opset_version(self):
         """Get opset version of onnx domain
@@ -898,7 +1224,11 @@ class OnnxModel:
         Returns:
             int: opset version of onnx domain.
         """
-        for opset in self.model.opset_import:
-            if opset.domain in ["", "ai.onnx"]:
-                return opset.version
-        raise RuntimeError("ONNX model has no opset for default domain")
+        if self._opset_version is None:
+            for opset in self.model.opset_import:
+                if opset.domain in ["", "ai.onnx"]:
+                    self._opset_version = opset.version
+                    break
+            else:
+                raise RuntimeError("ONNX model has no opset for default domain")
+        return self._opset_version
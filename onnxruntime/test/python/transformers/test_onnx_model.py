@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# coding: utf-8
+# -------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation.  All rights reserved.
+# Licensed under the MIT License.  See License.txt in the project root for
+# license information.
+# --------------------------------------------------------------------------
+
+import os
+import sys
+import unittest
+
+import numpy as np
+from onnx import TensorProto, helper, numpy_helper
+
+# These tests only need onnx, so locate the transformers source directly instead of
+# going through parity_utilities (which requires torch).
+transformers_dir = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'python', 'tools', 'transformers')
+if os.path.exists(transformers_dir):
+    if transformers_dir not in sys.path:
+        sys.path.append(transformers_dir)
+    from onnx_model import OnnxModel
+else:
+    from onnxruntime.transformers.onnx_model import OnnxModel
+
+
+def create_test_model():
+    """Creates a small model: x -> Add(a) -> t1 -> Mul(b) -> t2 -> Sub(c) -> y."""
+    initializers = [
+        numpy_helper.from_array(np.array([1.0], dtype=np.float32), "a"),
+        numpy_helper.from_array(np.array([2.0], dtype=np.float32), "b"),
+    ]
+    nodes = [
+        helper.make_node("Constant", [], ["c"],
+                         name="Const_0",
+                         value=numpy_helper.from_array(np.array([3.0], dtype=np.float32))),
+        helper.make_node("Add", ["x", "a"], ["t1"], name="Add_0"),
+        helper.make_node("Mul", ["t1", "b"], ["t2"], name="Mul_0"),
+        helper.make_node("Sub", ["t2", "c"], ["y"], name="Sub_0"),
+    ]
+    graph = helper.make_graph(nodes, "test_graph",
+                              [helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+                              [helper.make_tensor_value_info("y", TensorProto.FLOAT, [1])],
+                              initializer=initializers)
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)])
+
+
+class TestOnnxModel(unittest.TestCase):
+    def test_maps_reflect_inplace_input_rename(self):
+        # Fusion helpers rename node inputs in place (node.input[i] = new_name),
+        # so the maps returned afterwards must reflect the rename.
+        model = OnnxModel(create_test_model())
+        model.input_name_to_nodes()
+        model.output_name_to_node()
+
+        mul_node = model.get_nodes_by_op_type("Mul")[0]
+        mul_node.input[0] = "t1_renamed"
+
+        self.assertIn("t1_renamed", model.input_name_to_nodes())
+        self.assertNotIn("t1_renamed", model.output_name_to_node())
+
+    def test_prune_graph_after_inplace_output_rename(self):
+        # Mirrors Gpt2OnnxModel.postprocess: query the maps, rename the root output
+        # in place, append a node producing the original output name, then prune.
+        model = OnnxModel(create_test_model())
+        output_name_to_node = model.output_name_to_node()
+        root_node = output_name_to_node["y"]
+        root_node.output[0] = "y_renamed"
+        model.add_node(helper.make_node("Identity", ["y_renamed"], ["y"], name="Identity_0"))
+
+        model.prune_graph()
+
+        remaining = sorted(node.name for node in model.nodes())
+        self.assertEqual(remaining, ["Add_0", "Const_0", "Identity_0", "Mul_0", "Sub_0"])
+
+    def test_update_graph_after_inplace_input_rename(self):
+        # After a rename makes an initializer unused, update_graph must remove it
+        # even when node/input/initializer counts did not change.
+        model = OnnxModel(create_test_model())
+        model.update_graph()
+
+        mul_node = model.get_nodes_by_op_type("Mul")[0]
+        mul_node.input[1] = "t1"  # initializer "b" is no longer used
+        model.update_graph()
+
+        self.assertIsNone(model.get_initializer("b"))
+        self.assertIsNotNone(model.get_initializer("a"))
+
+    def test_replace_input_of_all_nodes_scope(self):
+        # The rename applies to the top-level graph only, regardless of any
+        # helper that may have run before it.
+        then_graph = helper.make_graph(
+            [helper.make_node("Identity", ["shared"], ["then_out"], name="Id_then")], "then_graph", [],
+            [helper.make_tensor_value_info("then_out", TensorProto.FLOAT, [1])])
+        else_graph = helper.make_graph(
+            [helper.make_node("Identity", ["shared"], ["else_out"], name="Id_else")], "else_graph", [],
+            [helper.make_tensor_value_info("else_out", TensorProto.FLOAT, [1])])
+        nodes = [
+            helper.make_node("Identity", ["shared"], ["top_out"], name="Id_top"),
+            helper.make_node("If", ["cond"], ["if_out"],
+                             name="If_0",
+                             then_branch=then_graph,
+                             else_branch=else_graph),
+        ]
+        graph = helper.make_graph(nodes, "top_graph",
+                                  [helper.make_tensor_value_info("shared", TensorProto.FLOAT, [1]),
+                                   helper.make_tensor_value_info("cond", TensorProto.BOOL, [])],
+                                  [helper.make_tensor_value_info("top_out", TensorProto.FLOAT, [1]),
+                                   helper.make_tensor_value_info("if_out", TensorProto.FLOAT, [1])])
+        model = OnnxModel(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)]))
+        model.input_name_to_nodes()  # must not affect the scope of the rename
+
+        model.replace_input_of_all_nodes("shared", "renamed")
+
+        top_node = model.output_name_to_node()["top_out"]
+        self.assertEqual(list(top_node.input), ["renamed"])
+        for subgraph_name in ["then_graph", "else_graph"]:
+            subgraph_node = model.get_graph_by_name(subgraph_name).node[0]
+            self.assertEqual(list(subgraph_node.input), ["shared"])
+
+    def test_add_nodes_keeps_subgraph_order(self):
+        # Nodes added to a subgraph must each land after their producers, since
+        # topological_sort does not re-sort subgraphs.
+        then_graph = helper.make_graph(
+            [
+                helper.make_node("Identity", ["b_out"], ["c2_out"], name="C2"),
+                helper.make_node("Identity", ["x"], ["p_out"], name="P"),
+                helper.make_node("Identity", ["a_out"], ["then_out"], name="C1"),
+            ], "then_graph", [], [helper.make_tensor_value_info("then_out", TensorProto.FLOAT, [1])])
+        else_graph = helper.make_graph(
+            [helper.make_node("Identity", ["x"], ["else_out"], name="E")], "else_graph", [],
+            [helper.make_tensor_value_info("else_out", TensorProto.FLOAT, [1])])
+        if_node = helper.make_node("If", ["cond"], ["if_out"],
+                                   name="If_0",
+                                   then_branch=then_graph,
+                                   else_branch=else_graph)
+        graph = helper.make_graph([if_node], "top_graph",
+                                  [helper.make_tensor_value_info("cond", TensorProto.BOOL, []),
+                                   helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+                                  [helper.make_tensor_value_info("if_out", TensorProto.FLOAT, [1])])
+        model = OnnxModel(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)]))
+
+        node_a = helper.make_node("Identity", ["p_out"], ["a_out"], name="A")
+        node_b = helper.make_node("Identity", ["x"], ["b_out"], name="B")
+        model.add_nodes([node_a, node_b], {"A": "then_graph", "B": "then_graph"})
+
+        order = [node.name for node in model.get_graph_by_name("then_graph").node]
+        self.assertGreater(order.index("A"), order.index("P"))
+        self.assertGreater(order.index("C1"), order.index("A"))
+        self.assertGreater(order.index("C2"), order.index("B"))
+
+    def test_add_to_subgraph_after_remove_nodes(self):
+        # Mirrors Fusion.apply: remove_nodes rebuilds the top-level node list, which
+        # copies a kept If node together with its subgraphs. A node added afterwards
+        # must land in the live subgraph of the model, not in a detached copy.
+        then_graph = helper.make_graph(
+            [helper.make_node("Identity", ["x"], ["then_out"], name="T")], "then_graph", [],
+            [helper.make_tensor_value_info("then_out", TensorProto.FLOAT, [1])])
+        else_graph = helper.make_graph(
+            [helper.make_node("Identity", ["x"], ["else_out"], name="E")], "else_graph", [],
+            [helper.make_tensor_value_info("else_out", TensorProto.FLOAT, [1])])
+        nodes = [
+            helper.make_node("Identity", ["x"], ["extra_out"], name="Extra"),
+            helper.make_node("If", ["cond"], ["if_out"],
+                             name="If_0",
+                             then_branch=then_graph,
+                             else_branch=else_graph),
+        ]
+        graph = helper.make_graph(nodes, "top_graph",
+                                  [helper.make_tensor_value_info("cond", TensorProto.BOOL, []),
+                                   helper.make_tensor_value_info("x", TensorProto.FLOAT, [1])],
+                                  [helper.make_tensor_value_info("if_out", TensorProto.FLOAT, [1])])
+        model = OnnxModel(helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)]))
+
+        model.graphs()  # warm the graph list like any helper would
+        model.remove_nodes([model.model.graph.node[0]])
+        new_node = helper.make_node("Identity", ["x"], ["new_out"], name="New")
+        model.add_nodes([new_node], {"New": "then_graph"})
+
+        # check the model proto itself, since a stale graph list would make both the
+        # add and a graphs()-based lookup agree on the detached copy
+        if_node = model.model.graph.node[0]
+        self.assertEqual(if_node.op_type, "If")
+        then_branch = [attr.g for attr in if_node.attribute if attr.name == "then_branch"][0]
+        self.assertIn("New", [node.name for node in then_branch.node])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft Corporation. All rights reserved.
 # Licensed under the MIT License.
 
+import fnmatch
 import json
 import os
 import pathlib
@@ -41,7 +42,24 @@ def gen_file_from_template(template_file: pathlib.Path, output_file: pathlib.Pat
         output.write(content)
 
 
-def copy_repo_relative_to_dir(patterns: List[str], dest_dir: pathlib.Path):
+def _link_or_copy_file(src, dst):
+    '''
+    Hard links a file if possible, falling back to a copy.
+    Staging directories are only read and then zipped, so a hard link avoids
+    copying the file contents.
+    '''
+    try:
+        # os.link does not overwrite, so remove any file left by a previous run
+        if os.path.lexists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        # hard links may not be supported, e.g., across filesystems
+        shutil.copy(src, dst)
+
+
+def copy_repo_relative_to_dir(patterns: List[str], dest_dir: pathlib.Path,
+                              copy_function=_link_or_copy_file):
     '''
     Copies file paths relative to the repo root to a directory.
     The given paths or path patterns are relative to the repo root, and the
@@ -49,13 +67,34 @@ def copy_repo_relative_to_dir(patterns: List[str], dest_dir: pathlib.Path):
 
     :param patterns The paths or path patterns relative to the repo root.
     :param dest_dir The destination directory.
+    :param copy_function The function used to copy an individual file.
     '''
-    paths = [path for pattern in patterns for path in repo_root.glob(pattern)]
-    for path in paths:
+    # group the patterns by directory so that each directory is only scanned once,
+    # even when several patterns (e.g., "dir/*.h" and "dir/*.m") refer to the same one
+    patterns_by_dir: Dict[str, List[str]] = {}
+    for pattern in patterns:
+        dir_part, _, name_part = pattern.rpartition("/")
+        patterns_by_dir.setdefault(dir_part, []).append(name_part)
+
+    paths = set()
+    for dir_part, name_patterns in patterns_by_dir.items():
+        if any(wildcard in dir_part for wildcard in "*?["):
+            # a pattern with wildcards in the directory part needs a full glob walk
+            for name_pattern in name_patterns:
+                paths.update(repo_root.glob(f"{dir_part}/{name_pattern}"))
+            continue
+        directory = repo_root / dir_part
+        if not directory.is_dir():
+            continue
+        for entry in directory.iterdir():
+            if any(fnmatch.fnmatch(entry.name, name_pattern) for name_pattern in name_patterns):
+                paths.add(entry)
+
+    for path in sorted(paths):
         repo_relative_path = path.relative_to(repo_root)
         dst_path = dest_dir / repo_relative_path
         os.makedirs(dst_path.parent, exist_ok=True)
-        shutil.copy(path, dst_path)
+        copy_function(path, dst_path)
 
 
 def load_framework_info(framework_info_file: pathlib.Path):